@@ -13,6 +13,8 @@ class Settings(BaseSettings):
     mongo_db_name: str = "stonksdb"
     tick_interval_minutes: float = 30.0
     initial_price: float = 100.0
+    tick_write_batch_size: int = 1
+    twitch_eventsub_enabled: bool = False
 
     model_config = SettingsConfigDict(
         env_file=".env",
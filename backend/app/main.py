@@ -1,22 +1,23 @@
 import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import Any, List
 
-from fastapi import Depends, FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from motor.motor_asyncio import AsyncIOMotorCollection
 
 from .config import settings
 from .db import close_client, get_database
-from .stonks_state import StonksState
+from .stonks_state import StonksState, encode_json
 from .twitch_client import TwitchClient
-from .twitch_helix_client import TwitchHelixClient
+from .twitch_eventsub_client import TwitchEventSubClient
+from .twitch_helix_client import TwitchHelixClient, close_shared_client
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Twitch Stonks")
+app = FastAPI(title="Twitch Stonks", default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -38,6 +39,14 @@ RANGE_MAP = {
 
 
 AGGREGATE_HOURLY_MAX_DAYS = 7
+# Large enough for the biggest range (365 daily buckets) to fit in the first
+# batch, so /history never needs a getMore round-trip.
+HISTORY_BATCH_SIZE = 1000
+
+# range -> (bucket the result was computed in, history epoch, encoded body).
+# Buckets only change once per hour/day and on each persisted tick, so every
+# request in between can share one aggregation.
+_history_cache: dict[str, tuple[datetime, int, bytes]] = {}
 
 
 def get_collection() -> AsyncIOMotorCollection:
@@ -48,20 +57,21 @@ def get_collection() -> AsyncIOMotorCollection:
 @app.on_event("startup")
 async def startup_event() -> None:
     collection = get_collection()
+    # Serves both the /history range scans and the latest-tick lookups.
+    await collection.create_index([("timestamp", 1)])
     state = StonksState(
         collection=collection,
         up_keyword=settings.stonks_up_keyword,
         down_keyword=settings.stonks_down_keyword,
         tick_interval_minutes=settings.tick_interval_minutes,
         initial_price=settings.initial_price,
+        write_batch_size=settings.tick_write_batch_size,
     )
     twitch = TwitchClient(
         username=settings.twitch_bot_username,
         oauth_token=settings.twitch_oauth_token,
         channel=settings.twitch_channel,
-        on_message=lambda msg: state.handle_message(msg)
-        if state.keyword_in_message(msg)
-        else None,
+        on_message=state.handle_message,
         on_status_change=state.set_twitch_status,
     )
     helix = TwitchHelixClient(
@@ -71,6 +81,15 @@ async def startup_event() -> None:
         on_status_change=state.set_stream_status,
         poll_interval_seconds=180,
     )
+    eventsub: TwitchEventSubClient | None = None
+    if settings.twitch_eventsub_enabled:
+        eventsub = TwitchEventSubClient(
+            client_id=settings.twitch_client_id,
+            oauth_token=settings.twitch_oauth_token,
+            channel=settings.twitch_channel,
+            on_status_change=helix.observe_status,
+            on_connection_change=helix.set_push_active,
+        )
     await state.start()
     try:
         await twitch.start()
@@ -80,9 +99,16 @@ async def startup_event() -> None:
         await helix.start()
     except Exception as exc:  # pragma: no cover - defensive
         logger.error("Failed to start Twitch Helix client: %s", exc)
+    if eventsub:
+        try:
+            await eventsub.start()
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.error("Failed to start Twitch EventSub client: %s", exc)
+    app.state.collection = collection
     app.state.stonks_state = state
     app.state.twitch_client = twitch
     app.state.twitch_helix_client = helix
+    app.state.twitch_eventsub_client = eventsub
 
 
 @app.on_event("shutdown")
@@ -90,9 +116,13 @@ async def shutdown_event() -> None:
     state: StonksState = app.state.stonks_state
     twitch: TwitchClient = app.state.twitch_client
     helix: TwitchHelixClient = app.state.twitch_helix_client
+    eventsub: TwitchEventSubClient | None = app.state.twitch_eventsub_client
+    if eventsub:
+        await eventsub.stop()
     await helix.stop()
     await twitch.stop()
     await state.stop()
+    await close_shared_client()
     close_client()
 
 
@@ -102,30 +132,40 @@ async def health() -> dict[str, str]:
 
 
 @app.get("/status")
-async def status() -> dict[str, Any]:
+async def status() -> ORJSONResponse:
     state: StonksState = app.state.stonks_state
     twitch: TwitchClient = app.state.twitch_client
-    return {
-        "twitch_connected": twitch.connected,
-        "stream_live": state.stream_live,
-        "next_tick_at": state.next_tick_at.isoformat(),
-        "current_price": state.current_price,
-        "tick_interval_minutes": state.tick_interval_minutes,
-        "twitch_channel": settings.twitch_channel,
-        "up_keyword": settings.stonks_up_keyword,
-        "down_keyword": settings.stonks_down_keyword,
-    }
+    # Returning the response directly skips FastAPI's jsonable_encoder pass.
+    return ORJSONResponse(
+        {
+            "twitch_connected": twitch.connected,
+            "stream_live": state.stream_live,
+            "next_tick_at": state.next_tick_at_iso,
+            "current_price": state.current_price,
+            "tick_interval_minutes": state.tick_interval_minutes,
+            "twitch_channel": settings.twitch_channel,
+            "up_keyword": settings.stonks_up_keyword,
+            "down_keyword": settings.stonks_down_keyword,
+        }
+    )
 
 
 @app.get("/history")
-async def history(
-    range: str = "today",
-    collection: AsyncIOMotorCollection = Depends(get_collection),
-) -> List[dict[str, Any]]:
+async def history(range: str = "today") -> Response:
     if range not in RANGE_MAP:
         raise HTTPException(status_code=400, detail="Invalid range")
-    start_time = datetime.now(timezone.utc) - RANGE_MAP[range]
+    state: StonksState = app.state.stonks_state
+    now = datetime.now(timezone.utc)
     unit = "hour" if RANGE_MAP[range].days <= AGGREGATE_HOURLY_MAX_DAYS else "day"
+    bucket = now.replace(minute=0, second=0, microsecond=0)
+    if unit == "day":
+        bucket = bucket.replace(hour=0)
+    cached = _history_cache.get(range)
+    if cached and cached[0] == bucket and cached[1] == state.history_epoch:
+        return Response(cached[2], media_type="application/json")
+    epoch = state.history_epoch
+    collection: AsyncIOMotorCollection = app.state.collection
+    start_time = now - RANGE_MAP[range]
 
     pipeline = [
         {"$match": {"timestamp": {"$gte": start_time}}},
@@ -156,12 +196,10 @@ async def history(
         {"$sort": {"timestamp": 1}},
     ]
 
-    cursor = collection.aggregate(pipeline)
-    results: List[dict[str, Any]] = []
-    async for doc in cursor:
-        doc["timestamp"] = doc["timestamp"].replace(tzinfo=timezone.utc).isoformat()
-        results.append(doc)
-    return results
+    cursor = collection.aggregate(pipeline, batchSize=HISTORY_BATCH_SIZE)
+    body = encode_json(await cursor.to_list(length=None))
+    _history_cache[range] = (bucket, epoch, body)
+    return Response(body, media_type="application/json")
 
 
 @app.websocket("/ws")
@@ -172,8 +210,6 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        if websocket in state._websockets:
-            state._websockets.remove(websocket)
+        state.unregister(websocket)
     except Exception:
-        if websocket in state._websockets:
-            state._websockets.remove(websocket)
+        state.unregister(websocket)
@@ -1,18 +1,43 @@
 import asyncio
 import contextlib
-import json
 import logging
+import re
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List
+from typing import Dict, List, Set
 
+import orjson
 from fastapi import WebSocket
 from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError
 
 logger = logging.getLogger(__name__)
 
+# MongoDB's E11000 duplicate key error code.
+DUPLICATE_KEY_ERROR = 11000
+# Chat-driven live counter updates are coalesced to at most one frame per
+# interval instead of one per matching message.
+LIVE_COUNTS_INTERVAL_SECONDS = 0.1
+# Each client gets its own bounded outbound queue so a slow consumer can't
+# stall broadcasts for everyone else; it is disconnected once it has had
+# this many frames dropped in a row.
+CLIENT_QUEUE_SIZE = 64
+MAX_CONSECUTIVE_DROPS = 256
 
-@dataclass
+TICK_PROJECTION = {"_id": 0, "timestamp": 1, "price": 1, "up_count": 1, "down_count": 1}
+
+
+def encode_json(payload: object) -> bytes:
+    # orjson formats datetimes natively; Mongo hands back naive UTC values.
+    return orjson.dumps(payload, option=orjson.OPT_NAIVE_UTC)
+
+
+def _encode_frame(payload: Dict[str, object]) -> str:
+    return encode_json(payload).decode()
+
+
+@dataclass(slots=True)
 class PricePoint:
     timestamp: datetime
     price: float
@@ -27,13 +52,12 @@ class PricePoint:
             "down_count": self.down_count,
         }
 
-    def to_json(self) -> Dict[str, object]:
-        return {
-            "timestamp": self.timestamp.replace(tzinfo=timezone.utc).isoformat(),
-            "price": self.price,
-            "up_count": self.up_count,
-            "down_count": self.down_count,
-        }
+
+@dataclass(slots=True)
+class ClientChannel:
+    queue: "asyncio.Queue[str]"
+    writer: asyncio.Task | None = None
+    drops: int = 0
 
 
 class StonksState:
@@ -44,43 +68,78 @@ class StonksState:
         down_keyword: str,
         tick_interval_minutes: float = 30.0,
         initial_price: float = 100.0,
+        write_batch_size: int = 1,
     ):
         self.collection = collection
-        self.up_keyword = up_keyword.lower()
-        self.down_keyword = down_keyword.lower()
+        # One alternation for both keywords; the longer keyword is tried first
+        # so "STONKS DOWN" is not also counted as "STONKS". Chat text arrives
+        # as raw UTF-8 bytes from TwitchClient, so the pattern is bytes too
+        # (case-insensitive for ASCII letters).
+        keywords = sorted(
+            ((up_keyword, "up"), (down_keyword, "down")),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self._keyword_re = re.compile(
+            b"|".join(
+                b"(?P<%s>%s)" % (name.encode(), re.escape(keyword.encode()))
+                for keyword, name in keywords
+            ),
+            re.IGNORECASE,
+        )
+        # Most chat lines contain neither keyword; checking for the keywords'
+        # first letters is a cheap C-level scan that lets those skip the regex.
+        self._keyword_initials = frozenset(
+            initial
+            for keyword in (up_keyword, down_keyword)
+            for initial in (keyword[:1].lower().encode(), keyword[:1].upper().encode())
+        )
         self.tick_interval_minutes = tick_interval_minutes
         self.tick_interval_seconds = tick_interval_minutes * 60
         self.current_price = initial_price
+        self.write_batch_size = max(1, write_batch_size)
+        self._pending: List[Dict[str, object]] = []
         self._up_counter = 0
         self._down_counter = 0
         self._ticker_task: asyncio.Task | None = None
+        self._live_task: asyncio.Task | None = None
+        self._live_event = asyncio.Event()
+        self._live_counts_template: Dict[str, object] = {
+            "type": "live_counts",
+            "up_count": 0,
+            "down_count": 0,
+            "next_tick_at": "",
+        }
         self._running = False
-        self._websockets: List[WebSocket] = []
-        self.next_tick_at = datetime.now(timezone.utc) + timedelta(
-            seconds=self.tick_interval_seconds
-        )
+        self._websockets: Dict[WebSocket, ClientChannel] = {}
+        self._close_tasks: Set[asyncio.Task] = set()
+        self._schedule_next_tick()
         self.twitch_connected = False
         self.stream_live = False
+        # Bumped whenever a tick is persisted so cached history can be invalidated.
+        self.history_epoch = 0
 
     def increment_up(self) -> None:
         self._up_counter += 1
         logger.debug("Incremented UP counter: %s", self._up_counter)
-        asyncio.create_task(self._broadcast_live_counters())
+        self._live_event.set()
 
     def increment_down(self) -> None:
         self._down_counter += 1
         logger.debug("Incremented DOWN counter: %s", self._down_counter)
-        asyncio.create_task(self._broadcast_live_counters())
+        self._live_event.set()
+
+    def _may_contain_keyword(self, message: bytes) -> bool:
+        return any(initial in message for initial in self._keyword_initials)
 
-    def handle_message(self, message: str) -> None:
-        lowered = message.lower()
-        matched = False
-        if self.up_keyword in lowered:
+    def handle_message(self, message: bytes) -> None:
+        if not self._may_contain_keyword(message):
+            return
+        matched = {match.lastgroup for match in self._keyword_re.finditer(message)}
+        if "up" in matched:
             self.increment_up()
-            matched = True
-        if self.down_keyword in lowered:
+        if "down" in matched:
             self.increment_down()
-            matched = True
         if matched:
             logger.info(
                 "Received twitch message affecting counters (up=%s, down=%s)",
@@ -91,7 +150,9 @@ class StonksState:
     async def start(self) -> None:
         if self._running:
             return
-        latest = await self.collection.find_one(sort=[("timestamp", -1)])
+        latest = await self.collection.find_one(
+            projection={"_id": 0, "price": 1}, sort=[("timestamp", -1)]
+        )
         if latest and "price" in latest:
             try:
                 self.current_price = float(latest["price"])
@@ -112,24 +173,49 @@ class StonksState:
         self._running = True
         logger.info("Starting ticker loop with interval %.2f minutes", self.tick_interval_minutes)
         self._ticker_task = asyncio.create_task(self._ticker_loop())
+        self._live_task = asyncio.create_task(self._live_broadcaster())
 
     async def stop(self) -> None:
         self._running = False
-        if self._ticker_task:
-            self._ticker_task.cancel()
-            with contextlib.suppress(asyncio.CancelledError):
-                await self._ticker_task
+        for task in (self._ticker_task, self._live_task):
+            if task:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        try:
+            await self._flush_pending()
+        except Exception as exc:  # pragma: no cover - safety net
+            logger.error("Failed to flush pending ticks on shutdown: %s", exc)
         for ws in list(self._websockets):
+            self.unregister(ws)
             await ws.close()
-        self._websockets.clear()
 
     async def _ticker_loop(self) -> None:
+        # Sleep towards an absolute deadline so time spent inside _tick does
+        # not push every later tick back.
+        deadline = time.monotonic() + self.tick_interval_seconds
         while self._running:
-            await asyncio.sleep(self.tick_interval_seconds)
+            await asyncio.sleep(max(0.0, deadline - time.monotonic()))
             try:
                 await self._tick()
             except Exception as exc:  # pragma: no cover - safety net
                 logger.error("Ticker execution failed: %s", exc)
+            deadline += self.tick_interval_seconds
+            now = time.monotonic()
+            if deadline < now:
+                # Fell more than a whole interval behind; resync instead of
+                # firing a burst of catch-up ticks.
+                deadline = now + self.tick_interval_seconds
+
+    async def _live_broadcaster(self) -> None:
+        while self._running:
+            await self._live_event.wait()
+            await asyncio.sleep(LIVE_COUNTS_INTERVAL_SECONDS)
+            self._live_event.clear()
+            try:
+                self._broadcast_live_counters()
+            except Exception as exc:  # pragma: no cover - safety net
+                logger.error("Live counter broadcast failed: %s", exc)
 
     async def _tick(self) -> None:
         up_count = self._up_counter
@@ -137,10 +223,10 @@ class StonksState:
         self._up_counter = 0
         self._down_counter = 0
         if up_count == 0 and down_count == 0:
-            self.next_tick_at = datetime.now(timezone.utc) + timedelta(
-                seconds=self.tick_interval_seconds
-            )
+            self._schedule_next_tick()
             logger.info("Ticker skipped due to no activity (up=0, down=0)")
+            # Chat went quiet; don't keep buffered ticks waiting for a full batch.
+            await self._flush_pending()
             return
         price_change = (up_count * 0.5) - (down_count * 0.5)
         self.current_price = max(0.0, self.current_price + price_change)
@@ -150,109 +236,161 @@ class StonksState:
             up_count=up_count,
             down_count=down_count,
         )
-        self.next_tick_at = datetime.now(timezone.utc) + timedelta(
-            seconds=self.tick_interval_seconds
-        )
-        await self.collection.insert_one(point.to_db())
+        self._schedule_next_tick()
+        self._pending.append(point.to_db())
+        if len(self._pending) >= self.write_batch_size:
+            await self._flush_pending()
         logger.info(
             "Ticker executed: price=%.2f, up_count=%s, down_count=%s",
             self.current_price,
             up_count,
             down_count,
         )
-        await self._broadcast(point)
-        await self._broadcast_live_counters()
+        self._broadcast(point)
+        self._broadcast_live_counters()
+
+    async def _flush_pending(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            await self.collection.insert_many(pending, ordered=False)
+        except BulkWriteError as exc:
+            # Unordered inserts write every document they can, so only the
+            # ones that failed go back; duplicate keys were already stored.
+            failed = {
+                error["index"]
+                for error in exc.details.get("writeErrors", [])
+                if error.get("code") != DUPLICATE_KEY_ERROR
+            }
+            self._pending[:0] = [doc for index, doc in enumerate(pending) if index in failed]
+            if exc.details.get("nInserted"):
+                self.history_epoch += 1
+            raise
+        except BaseException:
+            # Keep the batch (ahead of anything queued meanwhile) for the next
+            # flush, including the final one in stop() after a cancellation.
+            self._pending[:0] = pending
+            raise
+        self.history_epoch += 1
+
+    @property
+    def next_tick_at(self) -> datetime:
+        return self._next_tick_at
+
+    @next_tick_at.setter
+    def next_tick_at(self, value: datetime) -> None:
+        self._next_tick_at = value
+        # Every status/broadcast payload reuses this string until the next tick.
+        self.next_tick_at_iso = value.isoformat()
+
+    def _schedule_next_tick(self) -> None:
+        self.next_tick_at = datetime.now(timezone.utc) + timedelta(
+            seconds=self.tick_interval_seconds
+        )
 
-    async def _broadcast(self, point: PricePoint) -> None:
+    def _broadcast(self, point: PricePoint) -> None:
         payload = {
-            **point.to_json(),
-            "next_tick_at": self.next_tick_at.isoformat(),
+            "timestamp": point.timestamp,
+            "price": point.price,
+            "up_count": point.up_count,
+            "down_count": point.down_count,
+            "next_tick_at": self.next_tick_at_iso,
             "twitch_connected": self.twitch_connected,
             "stream_live": self.stream_live,
             "type": "tick",
         }
-        await self._send_payload(payload)
+        self._send_payload(payload)
 
-    async def _broadcast_status_update(self) -> None:
+    def _broadcast_status_update(self) -> None:
         payload = {
             "type": "status",
             "twitch_connected": self.twitch_connected,
             "stream_live": self.stream_live,
-            "next_tick_at": self.next_tick_at.isoformat(),
+            "next_tick_at": self.next_tick_at_iso,
         }
-        await self._send_payload(payload)
+        self._send_payload(payload)
 
-    async def _broadcast_live_counters(self) -> None:
-        payload = {
-            "type": "live_counts",
-            "up_count": self._up_counter,
-            "down_count": self._down_counter,
-            "next_tick_at": self.next_tick_at.isoformat(),
-        }
-        await self._send_payload(payload)
+    def _live_counts_payload(self) -> Dict[str, object]:
+        # Reused template; safe because encoding happens synchronously.
+        payload = self._live_counts_template
+        payload["up_count"] = self._up_counter
+        payload["down_count"] = self._down_counter
+        payload["next_tick_at"] = self.next_tick_at_iso
+        return payload
+
+    def _broadcast_live_counters(self) -> None:
+        self._send_payload(self._live_counts_payload())
 
-    async def _send_payload(self, payload: Dict[str, object]) -> None:
-        message = json.dumps(payload)
-        disconnected: List[WebSocket] = []
-        for ws in self._websockets:
+    def _send_payload(self, payload: Dict[str, object]) -> None:
+        # Encode once and fan the same text frame out to every client; the
+        # frontend parses text frames, so decode instead of send_bytes.
+        message = _encode_frame(payload)
+        for ws, client in list(self._websockets.items()):
             try:
-                await ws.send_text(message)
-            except Exception:
-                disconnected.append(ws)
-        for ws in disconnected:
-            if ws in self._websockets:
-                self._websockets.remove(ws)
+                client.queue.put_nowait(message)
+                client.drops = 0
+                continue
+            except asyncio.QueueFull:
+                # Drop the oldest frame; newer state supersedes it.
+                client.queue.get_nowait()
+                client.queue.put_nowait(message)
+                client.drops += 1
+            if client.drops >= MAX_CONSECUTIVE_DROPS:
+                logger.warning("Disconnecting WebSocket client that stopped reading")
+                self.unregister(ws)
+                task = asyncio.create_task(ws.close())
+                self._close_tasks.add(task)
+                task.add_done_callback(self._close_tasks.discard)
 
-    async def register(self, websocket: WebSocket) -> None:
-        await websocket.accept()
-        self._websockets.append(websocket)
-        latest = await self.collection.find_one(sort=[("timestamp", -1)])
-        if latest:
-            latest.pop("_id", None)
-            latest_ts = latest.get("timestamp")
-            if isinstance(latest_ts, str):
-                ts_value = datetime.fromisoformat(latest_ts)
-            elif latest_ts is None:
-                ts_value = datetime.now(timezone.utc)
-            else:
-                ts_value = latest_ts
-            if ts_value.tzinfo is None:
-                ts_value = ts_value.replace(tzinfo=timezone.utc)
-            latest_payload = {
-                "timestamp": ts_value.isoformat(),
-                "price": latest.get("price", 0.0),
-                "up_count": latest.get("up_count", 0),
-                "down_count": latest.get("down_count", 0),
-                "next_tick_at": self.next_tick_at.isoformat(),
-                "twitch_connected": self.twitch_connected,
-                "stream_live": self.stream_live,
-            }
-            await websocket.send_text(json.dumps(latest_payload))
-        await websocket.send_text(
-            json.dumps(
-                {
-                    "type": "live_counts",
-                    "up_count": self._up_counter,
-                    "down_count": self._down_counter,
-                    "next_tick_at": self.next_tick_at.isoformat(),
-                }
-            )
+    async def _writer(self, websocket: WebSocket, queue: "asyncio.Queue[str]") -> None:
+        try:
+            while True:
+                await websocket.send_text(await queue.get())
+        except Exception as exc:
+            logger.debug("WebSocket writer stopped: %s", exc)
+            self._websockets.pop(websocket, None)
+
+    def unregister(self, websocket: WebSocket) -> None:
+        client = self._websockets.pop(websocket, None)
+        if client and client.writer:
+            client.writer.cancel()
+
+    async def build_snapshot(self) -> Dict[str, object] | None:
+        latest = await self.collection.find_one(
+            projection=TICK_PROJECTION, sort=[("timestamp", -1)]
         )
+        if not latest:
+            return None
+        # TICK_PROJECTION limits the document to the tick fields, and
+        # timestamps are stored as BSON dates, so it can be sent as-is.
+        return {
+            **latest,
+            "next_tick_at": self.next_tick_at_iso,
+            "twitch_connected": self.twitch_connected,
+            "stream_live": self.stream_live,
+        }
 
-    def keyword_in_message(self, message: str) -> bool:
-        lowered = message.lower()
-        return self.up_keyword in lowered or self.down_keyword in lowered
+    async def register(self, websocket: WebSocket) -> None:
+        await websocket.accept()
+        client = ClientChannel(queue=asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE))
+        snapshot = await self.build_snapshot()
+        if snapshot:
+            client.queue.put_nowait(_encode_frame(snapshot))
+        client.queue.put_nowait(_encode_frame(self._live_counts_payload()))
+        client.writer = asyncio.create_task(self._writer(websocket, client.queue))
+        self._websockets[websocket] = client
 
     def set_twitch_status(self, connected: bool) -> None:
         if self.twitch_connected == connected:
             return
         self.twitch_connected = connected
         logger.info("Twitch connection status changed: %s", connected)
-        asyncio.create_task(self._broadcast_status_update())
+        self._broadcast_status_update()
 
     def set_stream_status(self, is_live: bool) -> None:
         if self.stream_live == is_live:
             return
         self.stream_live = is_live
         logger.info("Twitch stream live status changed: %s", is_live)
-        asyncio.create_task(self._broadcast_status_update())
+        self._broadcast_status_update()
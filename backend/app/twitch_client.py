@@ -6,6 +6,17 @@ from typing import Callable, Optional
 
 logger = logging.getLogger(__name__)
 
+RECONNECT_BASE_DELAY_SECONDS = 5.0
+RECONNECT_MAX_DELAY_SECONDS = 60.0
+CONNECT_TIMEOUT_SECONDS = 10.0
+READ_CHUNK_SIZE = 65536
+MAX_LINE_BYTES = 65536
+# Twitch's keepalive is always this exact line, so the reply can be reused.
+TWITCH_PING = b"PING :tmi.twitch.tv"
+TWITCH_PONG = b"PONG :tmi.twitch.tv\r\n"
+# RPL_WELCOME, sent only once PASS/NICK have been accepted.
+TWITCH_WELCOME = b":tmi.twitch.tv 001 "
+
 
 class TwitchClient:
     def __init__(
@@ -13,7 +24,7 @@ class TwitchClient:
         username: str,
         oauth_token: str,
         channel: str,
-        on_message: Optional[Callable[[str], None]],
+        on_message: Optional[Callable[[bytes], None]],
         on_status_change: Optional[Callable[[bool], None]] = None,
         use_tls: bool = True,
     ):
@@ -23,8 +34,12 @@ class TwitchClient:
         self.on_message = on_message
         self.on_status_change = on_status_change
         self.use_tls = use_tls
+        self._login_frames = (
+            f"PASS {oauth_token}\r\nNICK {username}\r\nJOIN #{channel}\r\n".encode()
+        )
         self._task: Optional[asyncio.Task] = None
         self._running = False
+        self._failures = 0
         self.connected = False
 
     async def start(self) -> None:
@@ -46,36 +61,67 @@ class TwitchClient:
                 await self._connect_and_listen()
             except Exception as exc:
                 logger.error("Twitch client error: %s", exc)
-                await self._update_status(False)
-                await asyncio.sleep(5)
+            # A clean return is a closed socket too (e.g. Twitch rejecting the
+            # login), so it backs off like any other failure.
+            await self._update_status(False)
+            self._failures += 1
+            if not self._running:
+                break
+            await asyncio.sleep(self._reconnect_delay())
+
+    def _reconnect_delay(self) -> float:
+        return min(
+            RECONNECT_MAX_DELAY_SECONDS,
+            RECONNECT_BASE_DELAY_SECONDS * 2 ** (self._failures - 1),
+        )
 
     async def _connect_and_listen(self) -> None:
         ssl_context = ssl.create_default_context() if self.use_tls else None
-        reader, writer = await asyncio.open_connection(
-            "irc.chat.twitch.tv", 6697 if self.use_tls else 6667, ssl=ssl_context
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                "irc.chat.twitch.tv", 6697 if self.use_tls else 6667, ssl=ssl_context
+            ),
+            timeout=CONNECT_TIMEOUT_SECONDS,
         )
-        writer.write(f"PASS {self.oauth_token}\r\n".encode())
-        writer.write(f"NICK {self.username}\r\n".encode())
-        writer.write(f"JOIN #{self.channel}\r\n".encode())
+        writer.write(self._login_frames)
         await writer.drain()
         await self._update_status(True)
         logger.info("Connected to Twitch IRC as %s", self.username)
 
+        buffer = b""
         try:
             while self._running:
-                line = await reader.readline()
-                if not line:
+                # Read whatever is available and dispatch every complete line in
+                # it, rather than paying one event-loop wakeup per line.
+                data = await reader.read(READ_CHUNK_SIZE)
+                if not data:
                     break
-                message = line.decode(errors="ignore").strip()
-                if message.startswith("PING"):
-                    writer.write(message.replace("PING", "PONG").encode() + b"\r\n")
+                *lines, buffer = (buffer + data).split(b"\r\n")
+                if len(buffer) > MAX_LINE_BYTES:
+                    raise ValueError("IRC line exceeds %d bytes" % MAX_LINE_BYTES)
+                replied = False
+                for line in lines:
+                    # Stay on bytes; chat text is handed over undecoded.
+                    if line == TWITCH_PING:
+                        writer.write(TWITCH_PONG)
+                        replied = True
+                    elif line.startswith(b"PING"):
+                        writer.write(b"PONG" + line[4:] + b"\r\n")
+                        replied = True
+                    elif self._failures and line.startswith(TWITCH_WELCOME):
+                        # Login accepted; only now is the backoff reset.
+                        self._failures = 0
+                    else:
+                        text = self._extract_message(line)
+                        if text is not None and self.on_message:
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug(
+                                    "Twitch message received: %s",
+                                    text.decode("utf-8", "replace"),
+                                )
+                            self.on_message(text)
+                if replied:
                     await writer.drain()
-                    continue
-                if "PRIVMSG" in message:
-                    text = self._extract_message(message)
-                    if text is not None and self.on_message:
-                        logger.debug("Twitch message received: %s", text)
-                        self.on_message(text)
         finally:
             await self._update_status(False)
             writer.close()
@@ -83,15 +129,15 @@ class TwitchClient:
                 await writer.wait_closed()
             logger.warning("Twitch IRC connection closed, retrying...")
 
-    def _extract_message(self, raw: str) -> Optional[str]:
-        try:
-            # IRC format: :username!user@host PRIVMSG #channel :message
-            _, trailing = raw.split("PRIVMSG", 1)
-            if " :" in trailing:
-                return trailing.split(" :", 1)[1]
-        except ValueError:
+    def _extract_message(self, raw: bytes) -> Optional[bytes]:
+        # IRC format: :username!user@host PRIVMSG #channel :message
+        command = raw.find(b"PRIVMSG")
+        if command < 0:
+            return None
+        start = raw.find(b" :", command)
+        if start < 0:
             return None
-        return None
+        return raw[start + 2 :].rstrip()
 
     async def _update_status(self, status: bool) -> None:
         if self.connected == status:
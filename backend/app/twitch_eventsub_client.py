@@ -0,0 +1,222 @@
+import asyncio
+import contextlib
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import orjson
+import websockets
+
+from .twitch_helix_client import get_shared_client
+
+logger = logging.getLogger(__name__)
+
+EVENTSUB_URL = "wss://eventsub.wss.twitch.tv/ws"
+SUBSCRIPTIONS_URL = "https://api.twitch.tv/helix/eventsub/subscriptions"
+USERS_URL = "https://api.twitch.tv/helix/users"
+STREAM_EVENTS = {"stream.online": True, "stream.offline": False}
+RECONNECT_BASE_DELAY_SECONDS = 5.0
+RECONNECT_MAX_DELAY_SECONDS = 60.0
+WELCOME_TIMEOUT_SECONDS = 10.0
+# Extra slack on top of the session keepalive before the socket is
+# considered dead.
+KEEPALIVE_GRACE_SECONDS = 5.0
+
+
+# Push-based stream.online/stream.offline listener. EventSub's WebSocket
+# transport only accepts user access tokens, so this reuses the IRC OAuth
+# token, which must have been issued for client_id.
+class TwitchEventSubClient:
+    def __init__(
+        self,
+        client_id: str,
+        oauth_token: str,
+        channel: str,
+        on_status_change: Optional[Callable[[bool], None]] = None,
+        on_connection_change: Optional[Callable[[bool], None]] = None,
+    ) -> None:
+        self.client_id = client_id
+        self.channel = channel
+        self.on_status_change = on_status_change
+        self.on_connection_change = on_connection_change
+        self._auth_headers = {
+            "Authorization": f"Bearer {oauth_token.removeprefix('oauth:')}",
+            "Client-Id": client_id,
+        }
+        self._task: asyncio.Task | None = None
+        self._running = False
+        self._failures = 0
+        self._broadcaster_id: str | None = None
+        self.connected = False
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._listen_loop())
+
+    async def stop(self) -> None:
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    async def _listen_loop(self) -> None:
+        while self._running:
+            try:
+                await self._connect_and_listen()
+            except Exception as exc:
+                logger.error("Twitch EventSub error: %r", exc)
+                self._update_connection(False)
+                self._failures += 1
+                if not self._running:
+                    break
+                await asyncio.sleep(
+                    min(
+                        RECONNECT_MAX_DELAY_SECONDS,
+                        RECONNECT_BASE_DELAY_SECONDS * 2 ** (self._failures - 1),
+                    )
+                )
+
+    async def _connect_and_listen(self) -> None:
+        ws, session = await self._open_session(EVENTSUB_URL)
+        try:
+            await self._subscribe(session["id"])
+            self._update_connection(True)
+            self._failures = 0
+            logger.info("Connected to Twitch EventSub for #%s", self.channel)
+
+            while self._running:
+                keepalive = self._keepalive_timeout(session)
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    # A bare TimeoutError has no message; say what timed out.
+                    raise RuntimeError(
+                        "EventSub keepalive timed out after %.0fs" % keepalive
+                    ) from None
+                message = orjson.loads(raw)
+                message_type = message["metadata"]["message_type"]
+                if message_type == "notification":
+                    self._handle_notification(message["payload"])
+                elif message_type == "session_reconnect":
+                    logger.info("Twitch EventSub requested reconnect")
+                    ws, session = await self._reconnect(
+                        ws, session, message["payload"]["session"]["reconnect_url"]
+                    )
+                elif message_type == "revocation":
+                    raise RuntimeError(
+                        "EventSub subscription revoked: %s"
+                        % message["payload"]["subscription"].get("status")
+                    )
+        finally:
+            await ws.close()
+
+    async def _open_session(self, url: str) -> Tuple[Any, Dict[str, Any]]:
+        ws = await websockets.connect(url)
+        try:
+            try:
+                raw = await asyncio.wait_for(ws.recv(), timeout=WELCOME_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise RuntimeError(
+                    "No EventSub session_welcome within %.0fs" % WELCOME_TIMEOUT_SECONDS
+                ) from None
+            welcome = orjson.loads(raw)
+            if welcome["metadata"]["message_type"] != "session_welcome":
+                raise RuntimeError(
+                    "Expected EventSub session_welcome, got %s"
+                    % welcome["metadata"]["message_type"]
+                )
+        except BaseException:
+            await ws.close()
+            raise
+        return ws, welcome["payload"]["session"]
+
+    async def _reconnect(
+        self, old_ws: Any, old_session: Dict[str, Any], url: str
+    ) -> Tuple[Any, Dict[str, Any]]:
+        # Twitch's handover: dial reconnect_url while the old socket keeps
+        # delivering events, and only drop it once the new session has sent
+        # its welcome. Anything arriving on the old socket meanwhile is still
+        # handled; a duplicate across both sockets is deduped downstream.
+        dial = asyncio.create_task(self._open_session(url))
+        receive: asyncio.Task | None = None
+        try:
+            while not dial.done():
+                receive = asyncio.create_task(old_ws.recv())
+                await asyncio.wait({dial, receive}, return_when=asyncio.FIRST_COMPLETED)
+                if not receive.done():
+                    break
+                if receive.exception() is not None:
+                    # Old socket already closed; just wait for the new one.
+                    break
+                message = orjson.loads(receive.result())
+                if message["metadata"]["message_type"] == "notification":
+                    self._handle_notification(message["payload"])
+            ws, session = await dial
+        finally:
+            if receive and not receive.done():
+                receive.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await receive
+            if not dial.done():
+                dial.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await dial
+        await old_ws.close()
+        # Subscriptions only carry over if Twitch resumed the same session.
+        if session["id"] != old_session["id"] or session.get("status") != "connected":
+            logger.warning("Twitch EventSub reconnect started a new session, resubscribing")
+            try:
+                await self._subscribe(session["id"])
+            except BaseException:
+                await ws.close()
+                raise
+        return ws, session
+
+    @staticmethod
+    def _keepalive_timeout(session: Dict[str, Any]) -> float:
+        return (session.get("keepalive_timeout_seconds") or 10) + KEEPALIVE_GRACE_SECONDS
+
+    def _handle_notification(self, payload: Dict[str, Any]) -> None:
+        is_live = STREAM_EVENTS.get(payload["subscription"]["type"])
+        if is_live is None or not self.on_status_change:
+            return
+        try:
+            self.on_status_change(is_live)
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.error("Stream status callback failed: %s", exc)
+
+    async def _subscribe(self, session_id: str) -> None:
+        client = get_shared_client()
+        if self._broadcaster_id is None:
+            response = await client.get(
+                USERS_URL, headers=self._auth_headers, params={"login": self.channel}
+            )
+            response.raise_for_status()
+            users = orjson.loads(response.content).get("data") or []
+            if not users:
+                raise RuntimeError(f"Twitch channel not found: {self.channel}")
+            self._broadcaster_id = users[0]["id"]
+        for event_type in STREAM_EVENTS:
+            response = await client.post(
+                SUBSCRIPTIONS_URL,
+                headers=self._auth_headers,
+                json={
+                    "type": event_type,
+                    "version": "1",
+                    "condition": {"broadcaster_user_id": self._broadcaster_id},
+                    "transport": {"method": "websocket", "session_id": session_id},
+                },
+            )
+            response.raise_for_status()
+
+    def _update_connection(self, connected: bool) -> None:
+        if self.connected == connected:
+            return
+        self.connected = connected
+        if self.on_connection_change:
+            try:
+                self.on_connection_change(connected)
+            except Exception as exc:  # pragma: no cover - defensive
+                logger.error("EventSub connection callback failed: %s", exc)
@@ -1,13 +1,48 @@
 import asyncio
 import contextlib
 import logging
-from datetime import datetime, timedelta, timezone
+import random
+import time
 from typing import Any, Callable, Dict, Optional
 
 import httpx
+import orjson
 
 logger = logging.getLogger(__name__)
 
+TOKEN_REFRESH_MARGIN_SECONDS = 120
+MIN_TOKEN_REFRESH_DELAY_SECONDS = 5.0
+STOP_GRACE_SECONDS = 1.0
+DEFAULT_RETRY_AFTER_SECONDS = 60.0
+TOKEN_URL = httpx.URL("https://id.twitch.tv/oauth2/token")
+STREAMS_URL = "https://api.twitch.tv/helix/streams"
+
+_shared_client: httpx.AsyncClient | None = None
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    # One pooled HTTP/2 client for every Helix instance, so polls reuse warm
+    # TLS connections instead of re-handshaking with id/api.twitch.tv.
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=10.0),
+            limits=httpx.Limits(
+                max_keepalive_connections=20,
+                max_connections=40,
+                keepalive_expiry=300.0,
+            ),
+            http2=True,
+        )
+    return _shared_client
+
+
+async def close_shared_client() -> None:
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
+
 
 class TwitchHelixClient:
     def __init__(
@@ -17,108 +52,252 @@ class TwitchHelixClient:
         channel: str,
         on_status_change: Optional[Callable[[bool], None]] = None,
         poll_interval_seconds: int = 180,
+        fallback_poll_interval_seconds: int = 900,
     ) -> None:
         self.client_id = client_id
         self.client_secret = client_secret
         self.channel = channel
         self.on_status_change = on_status_change
         self.poll_interval_seconds = poll_interval_seconds
+        self.fallback_poll_interval_seconds = fallback_poll_interval_seconds
+        # While a push source (EventSub) is connected, polling only serves as
+        # a slow consistency check.
+        self._push_active = False
         self._task: asyncio.Task | None = None
+        self._refresh_task: asyncio.Task | None = None
         self._running = False
+        self._consecutive_failures = 0
+        # Loop time before which Twitch asked us (HTTP 429) not to poll again.
+        self._next_poll_at = 0.0
+        self._wake = asyncio.Event()
+        self._stop_event = asyncio.Event()
         self._token: str | None = None
-        self._token_expires_at: datetime | None = None
+        self._token_lock = asyncio.Lock()
+        # Event-loop (monotonic) time at which the current token expires.
+        self._token_expires_at_monotonic = 0.0
         self._client: httpx.AsyncClient | None = None
+        # Stable between token refreshes; rebuilt only in _refresh_token.
+        self._auth_headers: Dict[str, str] = {}
+        # Parsed and query-encoded once instead of on every poll.
+        self._streams_url = httpx.URL(STREAMS_URL, params={"user_login": channel})
         self.last_stream_data: Dict[str, Any] | None = None
+        self._last_is_live: bool | None = None
 
     async def start(self) -> None:
         if self._running:
             return
         self._running = True
-        self._client = httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=10.0))
+        self._stop_event.clear()
+        self._client = get_shared_client()
         await self._ensure_token()
+        # The first poll runs inline so that it also opens the connection to
+        # api.twitch.tv (the token request only warmed id.twitch.tv); the loop
+        # then starts with a sleep instead of a second, back-to-back poll.
+        await self._poll_once()
         self._task = asyncio.create_task(self._poll_loop())
 
     async def stop(self) -> None:
         self._running = False
+        # Let the poll loop notice the stop and return on its own; cancelling
+        # is only a fallback for a poll stuck in an HTTP request.
+        self._stop_event.set()
+        self._wake.set()
         if self._task:
-            self._task.cancel()
-            with contextlib.suppress(asyncio.CancelledError):
-                await self._task
-        if self._client:
-            await self._client.aclose()
+            await asyncio.wait({self._task}, timeout=STOP_GRACE_SECONDS)
+        for task in (self._task, self._refresh_task):
+            if task:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
 
     async def _poll_loop(self) -> None:
-        while self._running:
-            try:
-                await self._check_stream_status()
-            except Exception as exc:  # pragma: no cover - safety net
-                logger.error("Helix poll failed: %s", exc)
-            await asyncio.sleep(self.poll_interval_seconds)
+        while not self._stop_event.is_set():
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), timeout=self._current_interval())
+            if self._stop_event.is_set():
+                break
+            # Cleared only after waking, so a poll_now() that lands while a
+            # poll is in flight triggers the next poll straight away.
+            self._wake.clear()
+            await self._poll_once()
+
+    async def _poll_once(self) -> None:
+        try:
+            await self._check_stream_status()
+        except Exception:  # pragma: no cover - safety net
+            # Expected HTTP/transport failures are handled (and counted
+            # for backoff) in _check_stream_status; anything reaching
+            # here is a bug, so log it loudly but keep polling.
+            logger.exception("Helix poll failed unexpectedly")
+
+    def _current_interval(self) -> float:
+        # Poll faster while live (to catch the stream ending), back off
+        # exponentially while failing, and jitter so that several pollers
+        # sharing a process don't fire in lockstep.
+        interval = float(
+            self.fallback_poll_interval_seconds
+            if self._push_active
+            else self.poll_interval_seconds
+        )
+        if self.last_stream_data:
+            interval *= 0.5
+        interval *= 2 ** min(self._consecutive_failures, 4)
+        interval *= random.uniform(0.8, 1.2)
+        rate_limited_for = self._next_poll_at - asyncio.get_running_loop().time()
+        return max(interval, rate_limited_for)
+
+    @staticmethod
+    def _retry_after_seconds(response: httpx.Response) -> float:
+        # Twitch reports rate limits via Ratelimit-Reset (epoch seconds);
+        # honour a standard Retry-After too if one is sent.
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            with contextlib.suppress(ValueError):
+                return float(retry_after)
+        reset_at = response.headers.get("Ratelimit-Reset")
+        if reset_at is not None:
+            with contextlib.suppress(ValueError):
+                return max(0.0, float(reset_at) - time.time())
+        return DEFAULT_RETRY_AFTER_SECONDS
+
+    def poll_now(self) -> None:
+        self._wake.set()
+
+    def set_push_active(self, active: bool) -> None:
+        self._push_active = active
+        if not active:
+            # Push just dropped; poll right away so no transition is missed.
+            self.poll_now()
 
     async def _ensure_token(self) -> None:
+        # Renewal ahead of expiry is scheduled by _refresh_token; this only
+        # covers the first fetch, recovery after a failed refresh, and a
+        # renewal that somehow didn't run in time.
         if (
             self._token
-            and self._token_expires_at
-            and self._token_expires_at - datetime.now(timezone.utc) > timedelta(seconds=60)
+            and asyncio.get_running_loop().time() + 60 < self._token_expires_at_monotonic
         ):
             return
         await self._refresh_token()
 
+    def _schedule_token_refresh(self, delay: float) -> None:
+        if self._refresh_task and self._refresh_task is not asyncio.current_task():
+            self._refresh_task.cancel()
+        self._refresh_task = asyncio.create_task(
+            self._refresh_later(max(delay, MIN_TOKEN_REFRESH_DELAY_SECONDS))
+        )
+
+    async def _refresh_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self._refresh_token()
+
     async def _refresh_token(self) -> None:
-        if not self._client:
-            self._client = httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=10.0))
-        try:
-            response = await self._client.post(
-                "https://id.twitch.tv/oauth2/token",
-                data={
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                    "grant_type": "client_credentials",
-                },
-            )
-            response.raise_for_status()
-            payload = response.json()
-            self._token = payload.get("access_token")
-            expires_in = int(payload.get("expires_in", 3600))
-            self._token_expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
-            logger.info("Obtained new Twitch Helix token (expires in %s seconds)", expires_in)
-        except Exception as exc:  # pragma: no cover - safety net
-            logger.error("Failed to refresh Twitch Helix token: %s", exc)
-            self._token = None
-            self._token_expires_at = None
+        # Single-flight: callers that queued behind an in-flight refresh see a
+        # different token once they get the lock and skip their own request.
+        stale_token = self._token
+        async with self._token_lock:
+            if self._token != stale_token:
+                return
+            if not self._client:
+                self._client = get_shared_client()
+            try:
+                response = await self._client.post(
+                    TOKEN_URL,
+                    data={
+                        "client_id": self.client_id,
+                        "client_secret": self.client_secret,
+                        "grant_type": "client_credentials",
+                    },
+                )
+                response.raise_for_status()
+                payload = orjson.loads(response.content)
+                self._token = payload.get("access_token")
+                self._auth_headers = {
+                    "Authorization": f"Bearer {self._token}",
+                    "Client-Id": self.client_id,
+                }
+                expires_in = int(payload.get("expires_in", 3600))
+                self._token_expires_at_monotonic = asyncio.get_running_loop().time() + expires_in
+                logger.debug("Obtained new Twitch Helix token (expires in %s seconds)", expires_in)
+                # Never closer than halfway to expiry, so a short (or bogus)
+                # expires_in can't turn renewal into a busy loop.
+                self._schedule_token_refresh(
+                    max(expires_in / 2, expires_in - TOKEN_REFRESH_MARGIN_SECONDS)
+                )
+            except Exception as exc:  # pragma: no cover - safety net
+                logger.error(
+                    "Failed to refresh Twitch Helix token: %s",
+                    exc,
+                    exc_info=logger.isEnabledFor(logging.DEBUG),
+                )
+                self._token = None
+                self._token_expires_at_monotonic = 0.0
+
+    async def _get_streams(self) -> httpx.Response:
+        return await self._client.get(self._streams_url, headers=self._auth_headers)
 
     async def _check_stream_status(self) -> None:
         await self._ensure_token()
         if not self._client or not self._token:
             logger.warning("Skipping stream status check: missing token or client")
+            self._consecutive_failures += 1
             return
-        headers = {"Authorization": f"Bearer {self._token}", "Client-Id": self.client_id}
-        params = {"user_login": self.channel}
         try:
-            response = await self._client.get("https://api.twitch.tv/helix/streams", headers=headers, params=params)
+            response = await self._get_streams()
             if response.status_code == 401:
+                # Retry once with a fresh token; a second 401 falls through to
+                # raise_for_status below.
                 logger.info("Helix token expired, refreshing and retrying")
                 await self._refresh_token()
                 if not self._token:
+                    self._consecutive_failures += 1
                     return
-                headers["Authorization"] = f"Bearer {self._token}"
-                response = await self._client.get(
-                    "https://api.twitch.tv/helix/streams", headers=headers, params=params
-                )
+                response = await self._get_streams()
             response.raise_for_status()
-            payload = response.json()
-            data = payload.get("data", []) if isinstance(payload, dict) else []
+            # Helix always answers with an object: {"data": [stream, ...],
+            # "pagination": {...}}, where data is empty while offline.
+            payload = orjson.loads(response.content)
+            data = payload.get("data") or []
             is_live = bool(data)
             self.last_stream_data = data[0] if is_live else None
+            self._consecutive_failures = 0
             self._update_stream_status(is_live)
-        except Exception as exc:  # pragma: no cover - safety net
-            logger.error("Failed to query Twitch stream status: %s", exc)
+        except httpx.HTTPStatusError as exc:
+            self._consecutive_failures += 1
+            if exc.response.status_code == 429:
+                delay = self._retry_after_seconds(exc.response)
+                self._next_poll_at = asyncio.get_running_loop().time() + delay
+                logger.warning("Helix rate limit hit, pausing polls for %.0f seconds", delay)
+            else:
+                logger.error(
+                    "Failed to query Twitch stream status: %s",
+                    exc,
+                    exc_info=logger.isEnabledFor(logging.DEBUG),
+                )
+        except (httpx.TransportError, asyncio.TimeoutError, orjson.JSONDecodeError) as exc:
+            self._consecutive_failures += 1
+            logger.error(
+                "Failed to query Twitch stream status: %s",
+                exc,
+                exc_info=logger.isEnabledFor(logging.DEBUG),
+            )
+
+    def observe_status(self, is_live: bool) -> None:
+        # Entry point for push sources (EventSub), so that the transition
+        # dedup below tracks what the consumer was last told regardless of
+        # where it came from; otherwise a catch-up poll after a dropped push
+        # connection could match the stale cache and be swallowed.
+        self._update_stream_status(is_live)
 
     def _update_stream_status(self, is_live: bool) -> None:
-        if not self.on_status_change:
+        # on_status_change fires on transitions only (and on the first poll);
+        # last_stream_data is the place to read per-poll details.
+        if not self.on_status_change or is_live == self._last_is_live:
             return
         try:
             self.on_status_change(is_live)
         except Exception as exc:  # pragma: no cover - defensive
             logger.error("Stream status callback failed: %s", exc)
+            return
+        self._last_is_live = is_live
 